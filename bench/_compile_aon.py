@@ -0,0 +1,32 @@
+"""Ahead-of-time compile the CSR AON kernel into a shared object.
+
+Repeated benchmark runs pay the Numba JIT warm-up on every process start
+(cache=True only skips recompilation, not loading/typing).  This script uses
+Numba's pycc AOT compiler to bake the kernel into `aon_siouxfalls.*.so`,
+which `_fast_aon` then imports and prefers over the JIT dispatcher --
+bypassing compilation entirely at benchmark time.
+
+Run once from the bench folder (and again whenever the kernel changes):
+    python bench/_compile_aon.py
+"""
+import os
+import sys
+
+from numba.pycc import CC
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _fast_aon
+
+cc = CC('aon_siouxfalls')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Same argument layout as _fast_aon.aon_csr: CSR topology, float64 weights,
+# OD pairs grouped by origin, and the first-through-node index.
+cc.export('aon_csr',
+          'f8[:](i8[:], i8[:], f8[:], i8[:], i8[:], f8[:], i8[:], i8)')(
+    _fast_aon.aon_csr.py_func)
+
+
+if __name__ == '__main__':
+    cc.compile()
+    print('Compiled aon_siouxfalls extension into', cc.output_dir)
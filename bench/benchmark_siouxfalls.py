@@ -13,6 +13,7 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 from network import Network
+import _fast_aon
 
 NET_FILE = os.path.join(os.path.dirname(__file__), '..', 'SiouxFalls_net.tntp')
 TRIPS_FILE = os.path.join(os.path.dirname(__file__), '..', 'SiouxFalls_trips.tntp')
@@ -30,7 +31,37 @@ def time_all_or_nothing(net, use_heap=True):
     return end - start
 
 
+def time_all_or_nothing_numba(net, csr=None):
+    """Time one AON pass through the jitted CSR kernel (JIT warmed up first)."""
+    if csr is None:
+        csr = _fast_aon.get_csr(net)
+    # Warm-up triggers JIT compilation so it is excluded from the timing.
+    _fast_aon.aon_from_network(net, csr)
+    start = time.perf_counter()
+    _fast_aon.aon_from_network(net, csr)
+    end = time.perf_counter()
+    return end - start
+
+
+def time_all_or_nothing_scipy(net, csr=None):
+    """Time one AON pass through scipy.sparse.csgraph.dijkstra."""
+    if csr is None:
+        csr = _fast_aon.get_csr(net)
+    # Warm-up (also JIT-compiles the predecessor walk).
+    _fast_aon.aon_scipy(net, csr)
+    start = time.perf_counter()
+    _fast_aon.aon_scipy(net, csr)
+    end = time.perf_counter()
+    return end - start
+
+
 def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark all-or-nothing implementations on SiouxFalls')
+    parser.add_argument('--scipy', action='store_true',
+                        help='Also time the scipy.sparse.csgraph.dijkstra mode')
+    args = parser.parse_args()
+
     net_path = os.path.abspath(NET_FILE)
     trips_path = os.path.abspath(TRIPS_FILE)
     print('Loading network from: ', net_path)
@@ -38,6 +69,7 @@ def main():
 
     times_label = []
     times_heap = []
+    times_numba = []
 
     for i in range(TRIALS):
         t = time_all_or_nothing(net, use_heap=False)
@@ -49,14 +81,36 @@ def main():
         times_heap.append(t)
         print(f'Trial {i+1} heap Dijkstra: {t:.6f} s')
 
+    csr = _fast_aon.get_csr(net)
+    for i in range(TRIALS):
+        t = time_all_or_nothing_numba(net, csr)
+        times_numba.append(t)
+        print(f'Trial {i+1} numba CSR: {t:.6f} s')
+
+    times_scipy = []
+    if args.scipy:
+        for i in range(TRIALS):
+            t = time_all_or_nothing_scipy(net, csr)
+            times_scipy.append(t)
+            print(f'Trial {i+1} scipy Dijkstra: {t:.6f} s')
+
     avg_label = sum(times_label) / len(times_label)
     avg_heap = sum(times_heap) / len(times_heap)
+    avg_numba = sum(times_numba) / len(times_numba)
 
     print('\nResults (average over {} trials):'.format(TRIALS))
     print(f'  Label-setting all-or-nothing: {avg_label:.6f} s')
     print(f'  Heap Dijkstra all-or-nothing: {avg_heap:.6f} s')
+    print(f'  Numba CSR all-or-nothing:     {avg_numba:.6f} s')
     if avg_heap > 0:
         print(f'  Speedup (label / heap): {avg_label/avg_heap:.2f}x')
+    if avg_numba > 0:
+        print(f'  Speedup (heap / numba): {avg_heap/avg_numba:.2f}x')
+    if times_scipy:
+        avg_scipy = sum(times_scipy) / len(times_scipy)
+        print(f'  SciPy Dijkstra all-or-nothing: {avg_scipy:.6f} s')
+        if avg_scipy > 0:
+            print(f'  Speedup (heap / scipy): {avg_heap/avg_scipy:.2f}x')
 
     # Optional CSV output
     outcsv = os.path.join(os.path.dirname(__file__), '..', 'bench_results_siouxfalls.csv')
@@ -66,6 +120,10 @@ def main():
             f.write(f'label,{i},{t:.6f}\n')
         for i, t in enumerate(times_heap, 1):
             f.write(f'heap,{i},{t:.6f}\n')
+        for i, t in enumerate(times_numba, 1):
+            f.write(f'numba,{i},{t:.6f}\n')
+        for i, t in enumerate(times_scipy, 1):
+            f.write(f'scipy,{i},{t:.6f}\n')
     print('CSV written to', outcsv)
 
 
@@ -10,6 +10,7 @@ import os
 import sys
 import csv
 import math
+import numpy as np
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
@@ -22,24 +23,17 @@ out_png = os.path.join(project_root, 'bench', 'siouxfalls_gap_plot.png')
 out_summary = os.path.join(project_root, 'bench', 'summary_siouxfalls.txt')
 
 def read_gap_csv(path):
-    iters = []
-    gaps = []
+    """Bulk-parse iteration/gap columns with np.loadtxt (summary rows start with '#')."""
     if not os.path.exists(path):
-        return iters, gaps
-    with open(path, 'r') as f:
-        reader = csv.reader(f)
-        header = next(reader, None)
-        for row in reader:
-            if not row or row[0].startswith('#'):
-                continue
-            try:
-                it = int(row[0])
-                gap = float(row[2])
-            except Exception:
-                continue
-            iters.append(it)
-            gaps.append(gap)
-    return iters, gaps
+        return [], []
+    try:
+        data = np.loadtxt(path, delimiter=',', skiprows=1, comments='#',
+                          usecols=(0, 2), ndmin=2)
+    except (ValueError, StopIteration):
+        return [], []
+    if data.size == 0:
+        return [], []
+    return data[:, 0].astype(int).tolist(), data[:, 1].tolist()
 
 iters_label, gaps_label = read_gap_csv(label_csv)
 iters_heap, gaps_heap = read_gap_csv(heap_csv)
@@ -1,5 +1,7 @@
 class OD:
 
+   __slots__ = ('origin', 'destination', 'demand', 'leastCost')
+
    def __init__(self, origin, destination, demand = 0):
       self.origin = origin
       self.destination = destination
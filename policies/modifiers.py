@@ -6,6 +6,42 @@ from typing import Dict, Tuple, List
 from network import Network
 
 
+def _links(net: Network) -> List:
+    """Flat list of Link objects, cached on the network after load."""
+    links = getattr(net, '_link_list', None)
+    if links is None:
+        links = net._link_list = list(net.link.values())
+    return links
+
+
+def _ods(net: Network) -> List:
+    """Flat list of OD objects, cached on the network after load."""
+    ods = getattr(net, '_od_list', None)
+    if ods is None:
+        ods = net._od_list = list(net.ODpair.values())
+    return ods
+
+
+def _refresh_costs(net: Network, touched_ids: List) -> None:
+    """Refresh costs for the given link IDs after their attributes changed.
+
+    With SoA arrays present, the touched slots are re-synced from the Link
+    objects and one masked updateCosts pass replaces N updateCost calls;
+    otherwise each link recomputes its own cost.
+    """
+    if getattr(net, 'linkOrder', None) is not None:
+        indices = [net.linkIndex[link_id] for link_id in touched_ids]
+        net.refreshLinkArrays(indices)
+        net.updateCosts(indices)
+    elif touched_ids:
+        # Hoist the unbound method once rather than re-resolving
+        # link.updateCost (attribute lookup + bound-method build) per link.
+        link_dict = net.link
+        update = type(link_dict[touched_ids[0]]).updateCost
+        for link_id in touched_ids:
+            update(link_dict[link_id])
+
+
 def expand_capacity(net: Network, link_ids: List[Tuple], factor: float) -> None:
     """Expand capacity on specified links.
     
@@ -14,22 +50,37 @@ def expand_capacity(net: Network, link_ids: List[Tuple], factor: float) -> None:
         link_ids: List of (i, j) tuples for links to expand
         factor: Multiplication factor (e.g., 1.25 for +25%)
     """
+    resolve = getattr(net, '_resolve', None) or net.link.get
+    touched = []
     for link_id in link_ids:
-        if link_id in net.link:
-            net.link[link_id].capacity *= factor
-            net.link[link_id].updateCost()
+        link = resolve(link_id)
+        if link is not None:
+            link.capacity *= factor
+            touched.append(link_id)
+    _refresh_costs(net, touched)
 
 
 def scale_capacity_systematic(net: Network, factor: float) -> None:
     """Scale all link capacities by a uniform factor.
-    
+
     Args:
         net: Network object
         factor: Multiplication factor (e.g., 1.1 for +10% on all links)
     """
-    for link in net.link.values():
-        link.capacity *= factor
-        link.updateCost()
+    if getattr(net, 'linkOrder', None) is not None:
+        # One array op plus a vectorized cost update; the Link objects stay
+        # canonical, so mirror the new capacities back onto them.
+        net.linkCapacity *= factor
+        for link in _links(net):
+            link.capacity *= factor
+        net.updateCosts()
+        return
+    links = _links(net)
+    if links:
+        update = type(links[0]).updateCost
+        for link in links:
+            link.capacity *= factor
+            update(link)
 
 
 def scale_demand(net: Network, factor: float) -> None:
@@ -39,9 +90,8 @@ def scale_demand(net: Network, factor: float) -> None:
         net: Network object
         factor: Multiplication factor (e.g., 1.2 for 20% demand growth)
     """
-    for origin_dict in net.ODpair.values():
-        for od in origin_dict.values():
-            od.demand *= factor
+    for od in _ods(net):
+        od.demand *= factor
 
 
 def scale_specific_demand(net: Network, od_pairs: List[Tuple], factor: float) -> None:
@@ -52,9 +102,11 @@ def scale_specific_demand(net: Network, od_pairs: List[Tuple], factor: float) ->
         od_pairs: List of (origin, destination) tuples
         factor: Multiplication factor
     """
+    od_dict = net.ODpair
     for origin, destination in od_pairs:
-        if origin in net.ODpair and destination in net.ODpair[origin]:
-            net.ODpair[origin][destination].demand *= factor
+        od = od_dict.get(str(origin) + '->' + str(destination))
+        if od is not None:
+            od.demand *= factor
 
 
 def add_toll(net: Network, link_ids: List[Tuple], toll_amount: float) -> None:
@@ -65,10 +117,14 @@ def add_toll(net: Network, link_ids: List[Tuple], toll_amount: float) -> None:
         link_ids: List of (i, j) tuples for toll links
         toll_amount: Additional cost (time units or monetary)
     """
+    resolve = getattr(net, '_resolve', None) or net.link.get
+    touched = []
     for link_id in link_ids:
-        if link_id in net.link:
-            net.link[link_id].toll = toll_amount
-            net.link[link_id].updateCost()
+        link = resolve(link_id)
+        if link is not None:
+            link.toll = toll_amount
+            touched.append(link_id)
+    _refresh_costs(net, touched)
 
 
 def remove_toll(net: Network, link_ids: List[Tuple]) -> None:
@@ -78,28 +134,40 @@ def remove_toll(net: Network, link_ids: List[Tuple]) -> None:
         net: Network object
         link_ids: List of (i, j) tuples
     """
+    resolve = getattr(net, '_resolve', None) or net.link.get
+    touched = []
     for link_id in link_ids:
-        if link_id in net.link:
-            net.link[link_id].toll = 0
-            net.link[link_id].updateCost()
+        link = resolve(link_id)
+        if link is not None:
+            link.toll = 0
+            touched.append(link_id)
+    _refresh_costs(net, touched)
 
 
 def reset_flows(net: Network) -> None:
     """Reset all link flows to zero.
-    
+
     Args:
         net: Network object
     """
-    for link in net.link.values():
+    if getattr(net, 'linkOrder', None) is not None:
+        # One memset on the SoA array; the Link objects stay canonical, so
+        # zero them too.
+        net.linkFlow.fill(0.0)
+    for link in _links(net):
         link.flow = 0
 
 
 def get_metrics(net: Network) -> Dict:
     """Calculate key performance metrics."""
-    tstt = sum(link.flow * link.cost for link in net.link.values())
-    total_demand = sum(od.demand for origin_dict in net.ODpair.values() 
-                      for od in origin_dict.values())
-    
+    if getattr(net, 'linkOrder', None) is not None:
+        # Single vectorized dot product over the SoA arrays instead of a
+        # per-link attribute-lookup sum.
+        tstt = float(net.linkFlow @ net.linkCost)
+    else:
+        tstt = sum(link.flow * link.cost for link in _links(net))
+    total_demand = sum(od.demand for od in _ods(net))
+
     return {
         'tstt': tstt,
         'total_demand': total_demand,
@@ -108,12 +176,58 @@ def get_metrics(net: Network) -> Dict:
     }
 
 
-def scale_capacity(net: Network, link_ids: List[Tuple], 
+def run_scenario(net: Network, policy_mods: List, stepSizeRule: str = 'FW',
+                 maxIterations: int = 3000, targetGap: float = 1e-4) -> Dict:
+    """Apply policy modifiers, solve UE, return metrics, then restore the network.
+
+    Lets a sweep reuse one parsed Network object: link flow/capacity/free flow
+    time/toll and OD demand are snapshotted before the modifiers run and put
+    back afterwards, so graph construction and trip parsing are paid once per
+    sweep instead of once per scenario.
+
+    Args:
+        net: Network object (reused across calls)
+        policy_mods: List of callables taking the network, e.g.
+                     [lambda n: scale_capacity(n, links, 2.0)]
+        stepSizeRule, maxIterations, targetGap: passed to userEquilibrium
+
+    Returns:
+        Metrics dict from get_metrics for the solved scenario.
+    """
+    links = _links(net)
+    ods = _ods(net)
+    saved_links = [(l.flow, l.capacity, l.freeFlowTime, l.toll) for l in links]
+    saved_demand = [od.demand for od in ods]
+    try:
+        for mod in policy_mods:
+            mod(net)
+        net.userEquilibrium(stepSizeRule, maxIterations, targetGap)
+        return get_metrics(net)
+    finally:
+        for link, (flow, capacity, fft, toll) in zip(links, saved_links):
+            link.flow = flow
+            link.capacity = capacity
+            link.freeFlowTime = fft
+            link.toll = toll
+        for od, demand in zip(ods, saved_demand):
+            od.demand = demand
+        if getattr(net, 'linkOrder', None) is not None:
+            net.refreshLinkArrays(range(len(links)))
+            net.updateCosts()
+        else:
+            for link in links:
+                link.updateCost()
+
+
+def scale_capacity(net: Network, link_ids: List[Tuple],
                    capacity_factor: float = 2.0, 
                    fft_factor: float = None) -> None:
     """Scale capacity and free flow time on selected links.
     
     Can model capacity expansion (factor > 1.0) or reduction (factor < 1.0).
+    Preserves existing link flows, so a subsequent userEquilibrium can be
+    warm-started from the pre-policy equilibrium; call reset_flows only
+    when a cold start is wanted.
     By default, free flow time adjusts inversely to capacity:
     - Double capacity (2.0x) → halve FFT (0.5x)
     - Halve capacity (0.5x) → double FFT (2.0x)
@@ -139,11 +253,13 @@ def scale_capacity(net: Network, link_ids: List[Tuple],
     if fft_factor is None:
         fft_factor = 1.0 / capacity_factor
     
+    resolve = getattr(net, '_resolve', None) or net.link.get
+    touched = []
     for link_id in link_ids:
-        if link_id in net.link:
-            net.link[link_id].capacity *= capacity_factor
-            net.link[link_id].freeFlowTime *= fft_factor
-            net.link[link_id].updateCost()
-        else:
-            # Silently skip missing links (they may not exist in all networks)
-            pass
+        link = resolve(link_id)
+        if link is not None:
+            link.capacity *= capacity_factor
+            link.freeFlowTime *= fft_factor
+            touched.append(link_id)
+        # Silently skip missing links (they may not exist in all networks)
+    _refresh_costs(net, touched)
@@ -1,4 +1,4 @@
-"""Run run_protocol twice with two network implementations and compare results.
+"""Run the protocol twice with two network implementations and compare results.
 
 Usage:
   python -m tests.compare_networks \
@@ -16,6 +16,8 @@ Usage:
 Notes:
 - network-a/b are optional; if omitted, uses current network.py for both (useful for deterministic smoke).
 - mode can be auto|fwstep|shift; func is required for auto.
+- Both sides run in-process via run_protocol.run_batch (no interpreter startup or
+  CSV round-trip between steps); network overrides reuse load_network_override.
 - Comparison exits with non-zero if accuracy regressions are detected (via compare_results).
 """
 from __future__ import annotations
@@ -25,16 +27,24 @@ import sys
 import os
 from typing import List
 
+from tests import compare_results
+from tests import run_protocol
+
 
 def run_cmd(cmd: List[str]):
+    """Run a subprocess, streaming its output line by line.
+
+    Used when a side of the comparison has to run out-of-process; streaming
+    shows progress immediately instead of buffering all output in memory.
+    """
     print("Running:", " ".join(cmd))
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.stdout:
-        print(result.stdout)
-    if result.stderr:
-        print(result.stderr, file=sys.stderr)
-    if result.returncode != 0:
-        raise SystemExit(result.returncode)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, bufsize=1)
+    for line in proc.stdout:
+        sys.stdout.write(line)
+    proc.wait()
+    if proc.returncode != 0:
+        raise SystemExit(proc.returncode)
 
 
 def main():
@@ -55,28 +65,35 @@ def main():
     if args.mode == 'auto' and not args.func:
         parser.error('--func is required in auto mode')
 
-    base_cmd = [sys.executable, '-m', 'tests.run_protocol', '--mode', args.mode, '--runs', str(args.runs), '--profile', args.profile]
-    if args.func:
-        base_cmd += ['--func', args.func]
-    base_cmd += ['--tests'] + args.tests
+    # If only side A overrides network.py, side B must reinstall the repo
+    # default, since load_network_override swaps the module process-wide.
+    network_b = args.network_b
+    if args.network_a and not network_b:
+        network_b = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'network.py')
 
-    cmd_a = base_cmd + ['--output', args.out_a]
-    if args.network_a:
-        cmd_a += ['--network-path', os.path.normpath(args.network_a)]
+    print(f"Running baseline protocol ({args.network_a or 'network.py'})...")
+    rows_a, _ = run_protocol.run_batch(args.tests, mode=args.mode, func=args.func,
+                                       runs=args.runs, network_path=args.network_a,
+                                       profile=args.profile)
+    run_protocol.write_rows_csv(rows_a, args.out_a)
 
-    cmd_b = base_cmd + ['--output', args.out_b]
-    if args.network_b:
-        cmd_b += ['--network-path', os.path.normpath(args.network_b)]
+    print(f"Running candidate protocol ({args.network_b or 'network.py'})...")
+    rows_b, _ = run_protocol.run_batch(args.tests, mode=args.mode, func=args.func,
+                                       runs=args.runs, network_path=network_b,
+                                       profile=args.profile)
+    run_protocol.write_rows_csv(rows_b, args.out_b)
 
-    run_cmd(cmd_a)
-    run_cmd(cmd_b)
-
-    compare_cmd = [sys.executable, '-m', 'tests.compare_results', args.out_a, args.out_b]
+    results = compare_results.compare_runs(rows_a, rows_b)
     if args.format == 'markdown':
-        compare_cmd += ['--format', 'markdown']
+        print(compare_results.format_markdown(results))
     else:
-        compare_cmd += ['--output', args.comparison]
-    run_cmd(compare_cmd)
+        compare_results.write_csv(results, args.comparison)
+        print(f"Wrote comparison to {args.comparison}")
+
+    regressions = sum(1 for r in results if r['accuracy_regressed'])
+    if regressions > 0:
+        print(f"{regressions} accuracy regression(s) detected!", file=sys.stderr)
+        raise SystemExit(1)
 
 
 if __name__ == '__main__':
@@ -13,9 +13,15 @@ It produces a summary showing:
 """
 import argparse
 import csv
+import io
 import sys
 from typing import Dict, List, Any
 
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
 
 def read_csv(path: str) -> List[Dict[str, Any]]:
     """Read CSV and return list of dicts."""
@@ -23,17 +29,23 @@ def read_csv(path: str) -> List[Dict[str, Any]]:
         return list(csv.DictReader(f))
 
 
-def parse_float(s: str) -> float:
-    """Parse float, return None if empty/invalid."""
+def parse_float(s) -> float:
+    """Parse float, return None if empty/invalid.
+
+    Accepts both CSV strings and the native values run_protocol.run_batch
+    rows carry when comparing in-process.
+    """
     try:
-        return float(s) if s.strip() else None
-    except ValueError:
+        return float(s) if str(s).strip() else None
+    except (ValueError, TypeError):
         return None
 
 
-def parse_bool(s: str) -> bool:
-    """Parse boolean string."""
-    return s.strip().lower() in ('true', '1', 'yes')
+def parse_bool(s) -> bool:
+    """Parse boolean (string form or native bool)."""
+    if isinstance(s, bool):
+        return s
+    return str(s).strip().lower() in ('true', '1', 'yes')
 
 
 def compare_runs(baseline: List[Dict], candidate: List[Dict]) -> List[Dict]:
@@ -86,6 +98,53 @@ def compare_runs(baseline: List[Dict], candidate: List[Dict]) -> List[Dict]:
     return results
 
 
+def _parse_bool_series(s):
+    """Vectorized equivalent of parse_bool for a pandas column."""
+    return s.astype(str).str.strip().str.lower().isin(('true', '1', 'yes'))
+
+
+def compare_frames(baseline, candidate) -> List[Dict]:
+    """Vectorized compare_runs: outer-merge two result DataFrames on test_spec.
+
+    Parsing and the diff arithmetic run as C-level column operations; the
+    return value has the same list-of-dicts shape as compare_runs, with
+    missing values mapped to None for the formatters.
+    """
+    m = baseline.merge(candidate, on='test_spec', how='outer',
+                       suffixes=('_base', '_cand'), sort=True)
+    time_base = pd.to_numeric(m.get('time_mean_s_base'), errors='coerce')
+    time_cand = pd.to_numeric(m.get('time_mean_s_cand'), errors='coerce')
+    passed_base = _parse_bool_series(m.get('passed_base', pd.Series('', index=m.index)))
+    passed_cand = _parse_bool_series(m.get('passed_cand', pd.Series('', index=m.index)))
+
+    time_diff = time_cand - time_base
+    time_rel_change = (time_diff / time_base * 100).where(time_base > 0)
+
+    metric_base = m.get('metric_base', pd.Series('', index=m.index)).fillna('')
+    metric_cand = m.get('metric_cand', pd.Series('', index=m.index)).fillna('')
+    metric = metric_cand.where(metric_cand != '', metric_base)
+
+    out = pd.DataFrame({
+        'test_spec': m['test_spec'],
+        'metric': metric,
+        'time_baseline_s': time_base,
+        'time_candidate_s': time_cand,
+        'time_diff_s': time_diff,
+        'time_rel_change_pct': time_rel_change,
+        'passed_baseline': passed_base,
+        'passed_candidate': passed_cand,
+        'accuracy_regressed': passed_base & ~passed_cand,
+        'accuracy_improved': ~passed_base & passed_cand,
+    })
+    records = out.to_dict('records')
+    for r in records:
+        for key in ('time_baseline_s', 'time_candidate_s',
+                    'time_diff_s', 'time_rel_change_pct'):
+            if pd.isna(r[key]):
+                r[key] = None
+    return records
+
+
 def format_markdown(results: List[Dict]) -> str:
     """Format comparison as markdown table."""
     lines = [
@@ -151,10 +210,14 @@ def write_csv(results: List[Dict], output_path: str) -> None:
         'time_baseline_s', 'time_candidate_s', 'time_diff_s', 'time_rel_change_pct',
         'passed_baseline', 'passed_candidate', 'accuracy_regressed', 'accuracy_improved'
     ]
+    # Render everything into one in-memory buffer and flush with a single
+    # write, instead of hitting the file descriptor once per row.
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(results)
     with open(output_path, 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
+        f.write(buf.getvalue())
 
 
 def main():
@@ -166,17 +229,28 @@ def main():
                         help='Output format (default: csv)')
     args = parser.parse_args()
     
-    baseline = read_csv(args.baseline)
-    candidate = read_csv(args.candidate)
-    
-    if not baseline:
-        print(f"Error: No data in baseline file {args.baseline}", file=sys.stderr)
-        sys.exit(1)
-    if not candidate:
-        print(f"Error: No data in candidate file {args.candidate}", file=sys.stderr)
-        sys.exit(1)
-    
-    results = compare_runs(baseline, candidate)
+    if pd is not None:
+        baseline = pd.read_csv(args.baseline)
+        candidate = pd.read_csv(args.candidate)
+        if baseline.empty:
+            print(f"Error: No data in baseline file {args.baseline}", file=sys.stderr)
+            sys.exit(1)
+        if candidate.empty:
+            print(f"Error: No data in candidate file {args.candidate}", file=sys.stderr)
+            sys.exit(1)
+        results = compare_frames(baseline, candidate)
+    else:
+        baseline = read_csv(args.baseline)
+        candidate = read_csv(args.candidate)
+
+        if not baseline:
+            print(f"Error: No data in baseline file {args.baseline}", file=sys.stderr)
+            sys.exit(1)
+        if not candidate:
+            print(f"Error: No data in candidate file {args.candidate}", file=sys.stderr)
+            sys.exit(1)
+
+        results = compare_runs(baseline, candidate)
     
     if args.format == 'markdown':
         output = format_markdown(results)
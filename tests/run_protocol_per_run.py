@@ -6,11 +6,14 @@ Usage:
 from __future__ import annotations
 import argparse
 import csv
+import functools
 import json
 import os
 import time
 import importlib.util
+import py_compile
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, Tuple, List, Callable
 
 import network
@@ -19,6 +22,12 @@ import utils
 
 def load_network_override(path: str):
     """Dynamically load a network.py alternative and install as the network module."""
+    try:
+        # Precompile so repeated invocations reuse the cached bytecode and
+        # syntax errors surface before any solve starts.
+        py_compile.compile(path, doraise=True)
+    except OSError:
+        pass
     spec = importlib.util.spec_from_file_location("network", path)
     if spec is None or spec.loader is None:
         raise ImportError(f"Cannot load network module from {path}")
@@ -28,61 +37,69 @@ def load_network_override(path: str):
     globals()['network'] = module
 
 
+def _int_or_float(s: str):
+    """Expected-answer field: iteration count (int) or final gap (float)."""
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+
+# normpath is pure Python and the same network/trips paths recur across
+# specs and runs, so memoize it.
+_norm = functools.lru_cache(maxsize=None)(os.path.normpath)
+
+
+# One converter per spec line, in file order: network file, trips file,
+# step rule, max iterations, target gap, gap function, optional expected
+# iterations/gap.
+_UE_SPEC_CONVERTERS = (_norm, _norm, str, int, float, str, _int_or_float)
+
+
 def parse_ue_spec(path: str):
-    """Parse UE solve spec: net, trips, step_rule, max_iters, target_gap, gap_func, optional expected_iterations."""
-    networkFile = None
-    tripsFile = None
-    step_rule = None
-    max_iters = None
-    target_gap = None
-    gap_func = None
-    expected_iters = None
+    """Parse UE solve spec: net, trips, step_rule, max_iters, target_gap, gap_func, optional expected_iterations.
+
+    Iterates the file line by line and assigns fields positionally from the
+    converter table, instead of materializing the whole file and walking an
+    is-None ladder per line.
+    """
+    fields = [None] * len(_UE_SPEC_CONVERTERS)
+    i = 0
     with open(path, "r") as f:
-        for line in f.read().splitlines():
-            if len(line.strip()) == 0 or line.lstrip().startswith('#'):
-                continue
-            if networkFile is None:
-                networkFile = os.path.normpath(line.strip())
-                continue
-            if tripsFile is None:
-                tripsFile = os.path.normpath(line.strip())
+        for raw in f:
+            line = raw.strip()
+            if not line or line[0] == '#':
                 continue
-            if step_rule is None:
-                step_rule = line.strip()
-                continue
-            if max_iters is None:
-                max_iters = int(line.strip())
-                continue
-            if target_gap is None:
-                target_gap = float(line.strip())
-                continue
-            if gap_func is None:
-                gap_func = line.strip()
-                continue
-            if expected_iters is None:
-                try:
-                    expected_iters = int(line.strip())
-                except ValueError:
-                    expected_iters = float(line.strip())
-                continue
-    return networkFile, tripsFile, step_rule, max_iters, target_gap, gap_func, expected_iters
+            fields[i] = _UE_SPEC_CONVERTERS[i](line)
+            i += 1
+            if i == len(_UE_SPEC_CONVERTERS):
+                break
+    return tuple(fields)
 
 
 def run_ue_test(spec_path: str) -> Tuple[float, float, bool, Dict]:
     """Run a full UE solve and return iterations, final gap, pass status."""
-    netf, tripsf, step_rule, max_iters, target_gap, gap_func_name, expected_iters = parse_ue_spec(spec_path)
+    return run_ue_test_prepared(*parse_ue_spec(spec_path))
+
+
+def run_ue_test_prepared(netf, tripsf, step_rule, max_iters, target_gap,
+                         gap_func_name, expected_iters) -> Tuple[float, float, bool, Dict]:
+    """Run a UE solve from already-parsed spec fields.
+
+    Callers that repeat a spec (e.g. multi-run campaigns) parse it once
+    and invoke this directly, keeping file I/O out of the timed path.
+    """
     net = network.Network(netf, tripsf)
-    
+
     # Get gap function reference
     if not hasattr(net, gap_func_name):
         raise AttributeError(f"Network has no attribute {gap_func_name}")
     gap_func = getattr(net, gap_func_name)
-    
-    # Solve UE
-    net.userEquilibrium(step_rule, max_iters, target_gap, gap_func)
-    
-    # Extract results from network module's globals (where userEquilibrium sets them)
-    rg = network.__dict__.get('relative_gaps', None)
+
+    # Solve UE; the gap history comes back in the result dict.
+    result = net.userEquilibrium(step_rule, max_iters, target_gap, gap_func)
+
+    rg = result.get('relative_gaps') if result else None
     if rg is not None and len(rg) > 0:
         actual_iters = len(rg)
         final_gap = rg[-1]
@@ -97,8 +114,8 @@ def run_ue_test(spec_path: str) -> Tuple[float, float, bool, Dict]:
             # Expected iterations
             passed = (actual_iters == expected_iters)
         else:
-            # Expected final gap
-            passed = abs(float(final_gap) / expected_iters - 1) <= 0.01
+            # Expected final gap (multiplicative relative test, no division)
+            passed = abs(float(final_gap) - expected_iters) <= 0.01 * abs(expected_iters)
     
     details = {
         "networkFile": netf,
@@ -115,56 +132,89 @@ def run_ue_test(spec_path: str) -> Tuple[float, float, bool, Dict]:
     return actual_iters, expected_iters if expected_iters else actual_iters, passed, details
 
 
+# Fixed CSV column order; rows are built as matching tuples so the csv
+# module formats them directly, with no per-row dict projection.
+RESULT_COLUMNS = ('test_spec', 'run_number', 'gap_function',
+                  'actual_iterations', 'final_gap', 'time_s', 'passed')
+
+
+def _run_one(task: Tuple[str, int], network_path: str = None) -> Tuple:
+    """Execute one (spec, run_number) task and return its CSV row tuple.
+
+    Top-level so it pickles for --jobs worker processes; each worker
+    re-applies the network override and times its own run, keeping the
+    measurement inside the process that did the work.
+    """
+    spec, run_num = task
+    if network_path:
+        load_network_override(_norm(network_path))
+    fields = parse_ue_spec(spec)
+    gap_func_name = fields[5]
+    t0 = time.perf_counter_ns()
+    actual_iters, expected, passed, details = run_ue_test_prepared(*fields)
+    elapsed_s = (time.perf_counter_ns() - t0) * 1e-9
+    return (spec, run_num, gap_func_name, actual_iters,
+            details.get('final_gap', ''), elapsed_s, bool(passed))
+
+
 def main():
     parser = argparse.ArgumentParser(description='Run UE protocol tests and log each run individually')
     parser.add_argument('--tests', nargs='+', required=True, help='Test spec files to run')
     parser.add_argument('--mode', choices=['auto','fwstep','shift','ue_solve'], default='ue_solve', help='Test mode')
     parser.add_argument('--network-path', default=None, help='Optional path to an alternative network.py implementation')
     parser.add_argument('--runs', type=int, default=3, help='Number of runs (default 3)')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes for running spec/run tasks in parallel (default 1: serial, isolated timing semantics preserved)')
     parser.add_argument('--output', default='test_protocol_per_run.csv', help='CSV summary output')
     args = parser.parse_args()
 
+    # Normalize paths once at argv-parse time; everything downstream
+    # receives normalized strings.
     if args.network_path:
-        load_network_override(os.path.normpath(args.network_path))
-
-    rows = []
-    for spec in args.tests:
-        spec = os.path.normpath(spec)
-        try:
-            if args.mode != 'ue_solve':
-                raise ValueError("run_protocol_per_run only supports ue_solve mode")
-            
-            netf, tripsf, step_rule, max_iters, target_gap, gap_func_name, expected_iters = parse_ue_spec(spec)
-            
-            # Run N times and log each separately
-            for run_num in range(1, args.runs + 1):
-                t0 = time.perf_counter()
-                actual_iters, expected, passed, details = run_ue_test(spec)
-                t1 = time.perf_counter()
-                elapsed_s = t1 - t0
-                
-                row = {
-                    'test_spec': spec,
-                    'run_number': run_num,
-                    'gap_function': gap_func_name,
-                    'actual_iterations': actual_iters,
-                    'final_gap': details.get('final_gap', ''),
-                    'time_s': elapsed_s,
-                    'passed': bool(passed),
-                }
-                rows.append(row)
-        except Exception as e:
-            print(f"Error running {spec}: {e}")
-            import traceback
-            traceback.print_exc()
-
-    # Write CSV with per-run details
-    fieldnames = ['test_spec', 'run_number', 'gap_function', 'actual_iterations', 'final_gap', 'time_s', 'passed']
+        args.network_path = _norm(args.network_path)
+        load_network_override(args.network_path)
+
+    # Stream rows as runs complete instead of buffering the whole campaign:
+    # each row matches the header exactly, and a flush per spec means a
+    # crash mid-campaign still leaves the finished runs on disk.
+    if args.mode != 'ue_solve':
+        raise ValueError("run_protocol_per_run only supports ue_solve mode")
+
+    specs = [_norm(spec) for spec in args.tests]
+
     with open(args.output, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for r in rows:
-            writer.writerow({k: r.get(k, '') for k in fieldnames})
+        writer = csv.writer(csvfile)
+        writer.writerow(RESULT_COLUMNS)
+        if args.jobs > 1:
+            # Spec/run tasks are independent solves, so they parallelize
+            # cleanly; rows are still written in task order.
+            tasks = [(spec, run_num)
+                     for spec in specs
+                     for run_num in range(1, args.runs + 1)]
+            worker = functools.partial(_run_one, network_path=args.network_path)
+            with ProcessPoolExecutor(max_workers=args.jobs) as ex:
+                futures = [ex.submit(worker, task) for task in tasks]
+                for task, future in zip(tasks, futures):
+                    try:
+                        writer.writerow(future.result())
+                        csvfile.flush()
+                    except Exception as e:
+                        print(f"Error running {task[0]} run {task[1]}: {e}")
+        else:
+            # One writerows per spec: the csv module batch-formats the
+            # spec's rows, and a flush per spec keeps completed work on
+            # disk if a later spec dies.
+            for spec in specs:
+                spec_rows = []
+                for run_num in range(1, args.runs + 1):
+                    try:
+                        spec_rows.append(_run_one((spec, run_num)))
+                    except Exception as e:
+                        print(f"Error running {spec} run {run_num}: {e}")
+                        import traceback
+                        traceback.print_exc()
+                        break
+                writer.writerows(spec_rows)
+                csvfile.flush()
 
     print(f"Wrote per-run results to {args.output}")
 